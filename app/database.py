@@ -1,5 +1,8 @@
 from typing import Optional, List
 from sqlmodel import Field, SQLModel, create_engine, Session, select
+from sqlmodel.ext.asyncio.session import AsyncSession
+from sqlalchemy import event
+from sqlalchemy.ext.asyncio import create_async_engine
 import os
 from dotenv import load_dotenv
 
@@ -27,6 +30,10 @@ class History(SQLModel, table=True):
     result_html: Optional[str] = None
     created_at_ts: int = Field(default=0) # Sortable timestamp
 
+class SeedState(SQLModel, table=True):
+    key: str = Field(primary_key=True) # e.g., "seed_files"
+    digest: str # sha256 of the seed files last applied
+
 # Setup DB Connection
 # Default to SQLite for local development if DATABASE_URL not set
 DATABASE_URL = os.environ.get("DATABASE_URL", "sqlite:///./local_database.db")
@@ -35,7 +42,62 @@ DATABASE_URL = os.environ.get("DATABASE_URL", "sqlite:///./local_database.db")
 if DATABASE_URL.startswith("postgres://"):
     DATABASE_URL = DATABASE_URL.replace("postgres://", "postgresql://", 1)
 
-engine = create_engine(DATABASE_URL)
+IS_SQLITE = DATABASE_URL.startswith("sqlite")
+
+# Pool tuning (ignored for SQLite). Both engines are live at request time, so
+# the most connections one process opens is
+#   DB_POOL_SIZE + DB_MAX_OVERFLOW + DB_SYNC_POOL_SIZE + DB_SYNC_MAX_OVERFLOW
+# (17 with the defaults). Keep that times the number of processes under the plan's limit.
+DB_POOL_SIZE = int(os.environ.get("DB_POOL_SIZE", "5")) # Async engine (request handlers)
+DB_MAX_OVERFLOW = int(os.environ.get("DB_MAX_OVERFLOW", "10"))
+DB_SYNC_POOL_SIZE = int(os.environ.get("DB_SYNC_POOL_SIZE", "2")) # Sync engine (startup, prompt loading)
+DB_SYNC_MAX_OVERFLOW = int(os.environ.get("DB_SYNC_MAX_OVERFLOW", "0"))
+DB_POOL_RECYCLE = int(os.environ.get("DB_POOL_RECYCLE", "1800")) # seconds
+DB_POOL_PRE_PING = os.environ.get("DB_POOL_PRE_PING", "true").lower() in ("1", "true", "yes")
+SQLITE_BUSY_TIMEOUT_MS = int(os.environ.get("SQLITE_BUSY_TIMEOUT_MS", "5000"))
+
+def _async_url(url):
+    """
+    Maps the sync URL to its async driver (aiosqlite / asyncpg).
+    """
+    if url.startswith("sqlite:"):
+        return url.replace("sqlite:", "sqlite+aiosqlite:", 1)
+    if url.startswith("postgresql:") or url.startswith("postgresql+psycopg2:"):
+        url = url.split(":", 1)[1]
+        # asyncpg does not understand libpq's sslmode
+        url = url.replace("sslmode=", "ssl=")
+        return "postgresql+asyncpg:" + url
+    return url
+
+def _engine_kwargs(pool_size, max_overflow):
+    if IS_SQLITE:
+        return {"connect_args": {"timeout": SQLITE_BUSY_TIMEOUT_MS / 1000}}
+    return {
+        "pool_size": pool_size,
+        "max_overflow": max_overflow,
+        "pool_recycle": DB_POOL_RECYCLE,
+        "pool_pre_ping": DB_POOL_PRE_PING,
+    }
+
+def _set_sqlite_pragmas(dbapi_connection, connection_record):
+    cursor = dbapi_connection.cursor()
+    # WAL lets readers proceed while a history row is being written
+    cursor.execute("PRAGMA journal_mode=WAL")
+    cursor.execute("PRAGMA synchronous=NORMAL")
+    cursor.execute(f"PRAGMA busy_timeout={SQLITE_BUSY_TIMEOUT_MS}")
+    cursor.execute("PRAGMA temp_store=MEMORY")
+    cursor.execute("PRAGMA cache_size=-16000") # ~16MB
+    cursor.close()
+
+# Sync engine: startup, seeding and the LLM service
+engine = create_engine(DATABASE_URL, **_engine_kwargs(DB_SYNC_POOL_SIZE, DB_SYNC_MAX_OVERFLOW))
+
+# Async engine: request handlers
+async_engine = create_async_engine(_async_url(DATABASE_URL), **_engine_kwargs(DB_POOL_SIZE, DB_MAX_OVERFLOW))
+
+if IS_SQLITE:
+    event.listen(engine, "connect", _set_sqlite_pragmas)
+    event.listen(async_engine.sync_engine, "connect", _set_sqlite_pragmas)
 
 def create_db_and_tables():
     SQLModel.metadata.create_all(engine)
@@ -43,3 +105,8 @@ def create_db_and_tables():
 def get_session():
     with Session(engine) as session:
         yield session
+
+async def get_async_session():
+    # expire_on_commit=False so handlers can read ids after commit without a lazy load
+    async with AsyncSession(async_engine, expire_on_commit=False) as session:
+        yield session
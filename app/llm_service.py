@@ -1,8 +1,6 @@
 import os
-from openai import OpenAI
-from google import genai
-from google.genai import types
 from app.utils import log_interaction, logger
+from app.tracing import span
 
 import json
 
@@ -13,7 +11,7 @@ def load_prompts():
     """
     Loads prompts from Database. Falls back to defaults if empty.
     """
-    with Session(engine) as session:
+    with span("prompts.load"), Session(engine) as session:
         statement = select(Prompt)
         results = session.exec(statement).all()
         
@@ -45,6 +43,9 @@ def generate_faqs_text(keyword, brief, web_content):
         if not api_key:
             raise ValueError("OPENROUTER_API_KEY is not set")
 
+        # Provider SDKs are imported lazily to keep cold start fast
+        from openai import OpenAI
+
         client = OpenAI(
             base_url="https://openrouter.ai/api/v1",
             api_key=api_key,
@@ -54,17 +55,18 @@ def generate_faqs_text(keyword, brief, web_content):
 
         log_interaction("Claude Request", user_content, None)
 
-        completion = client.chat.completions.create(
-            extra_headers={
-                "HTTP-Referer": site_url,
-                "X-Title": site_name,
-            },
-            model="anthropic/claude-3.7-sonnet",
-            messages=[
-                {"role": "system", "content": system_prompt},
-                {"role": "user", "content": user_content}
-            ]
-        )
+        with span("llm.claude"):
+            completion = client.chat.completions.create(
+                extra_headers={
+                    "HTTP-Referer": site_url,
+                    "X-Title": site_name,
+                },
+                model="anthropic/claude-3.7-sonnet",
+                messages=[
+                    {"role": "system", "content": system_prompt},
+                    {"role": "user", "content": user_content}
+                ]
+            )
         
         result = completion.choices[0].message.content
         log_interaction("Claude Response", user_content, result)
@@ -86,6 +88,9 @@ def generate_final_html(template_html, faq_texts):
         if not api_key:
             raise ValueError("GEMINI_API_KEY is not set")
 
+        from google import genai
+        from google.genai import types
+
         client = genai.Client(api_key=api_key)
 
         model = "gemini-2.5-pro" 
@@ -120,11 +125,12 @@ def generate_final_html(template_html, faq_texts):
         # User code: "for chunk in client.models.generate_content_stream..."
         
         # Simplified for non-streaming to ensure I get full text easily
-        response = client.models.generate_content(
-           model=model,
-           contents=contents,
-           config=generate_content_config
-        )
+        with span("llm.gemini"):
+            response = client.models.generate_content(
+               model=model,
+               contents=contents,
+               config=generate_content_config
+            )
         response_text = response.text
 
         log_interaction("Gemini Response", user_message, response_text)
@@ -1,63 +1,76 @@
-from fastapi import FastAPI, HTTPException, UploadFile, File, Form, Depends, status
+from fastapi import FastAPI, HTTPException, UploadFile, File, Form, Depends, Query, status
 from fastapi.staticfiles import StaticFiles
 from fastapi.security import OAuth2PasswordBearer, OAuth2PasswordRequestForm
 from pydantic import BaseModel
 from typing import Optional, List, Dict
 import os
 import json
+import asyncio
 import base64
 from app.scraper import UltimateScraper
+from app.prefetch import ScrapePrefetcher
+from app.tracing import span, current_trace, trace_request, request_profile_next, slowest_traces, PROFILE_NEXT_MAX, TRACE_BUFFER_SIZE
 from app.llm_service import generate_faqs_text, generate_final_html
 from app.utils import log_interaction, logger
-from app.auth import verify_password, create_access_token, decode_token, get_password_hash
-from app.database import create_db_and_tables, get_session, Prompt, Template, History, Session, select
+from app.auth import verify_password, create_access_token, decode_token, get_password_hash, is_admin
+from app.database import create_db_and_tables, get_async_session, AsyncSession, async_engine, Prompt, Template, History, select
+from app.startup import seed_database, warm_imports
+from app.search import create_search_tables, backfill_search_index, index_history, remove_history, search_history
+from sqlalchemy import text, func
 from dotenv import load_dotenv
 
 load_dotenv()
 
 app = FastAPI()
 
+# Opt-in request tracing and profiling (see app/tracing.py)
+app.middleware("http")(trace_request)
+
+# Readiness flag, flipped once seeding is done
+app_state = {"ready": False, "search_indexed": False, "init_task": None}
+
+def _initialize():
+    # Runs in a worker thread so uvicorn starts serving /healthz right away
+    try:
+        # Seed data only when the seed files changed since the last boot
+        seed_database()
+        app_state["ready"] = True
+        # Preload provider SDKs and scraper backends off the request path
+        warm_imports()
+        # Index history rows older than the search index (once per index version)
+        backfill_search_index()
+        app_state["search_indexed"] = True
+    except Exception as e:
+        logger.error(f"Startup initialization failed: {e}")
+
 # Init DB on startup
 @app.on_event("startup")
-def on_startup():
+async def on_startup():
+    # Only the schema is created inline, the handlers need the tables
     create_db_and_tables()
-    # Migration Logic (Seed data if empty)
-    from app.database import engine
-    with Session(engine) as session:
-        # Seed Prompts
-        if not session.exec(select(Prompt)).first():
-            logger.info("Seeding Prompts from file...")
-            if os.path.exists("prompts.json"):
-                try:
-                    with open("prompts.json", "r", encoding="utf-8") as f:
-                        data = json.load(f)
-                        session.add(Prompt(key="claude", content=data.get("system_prompt_claude", "")))
-                        session.add(Prompt(key="gemini", content=data.get("system_prompt_gemini", "")))
-                        session.commit()
-                except Exception as e:
-                    logger.error(f"Error seeding prompts: {e}")
-        
-        # Seed Templates
-        if not session.exec(select(Template)).first():
-            logger.info("Seeding Templates from files...")
-            if os.path.exists("templates/code"):
-                for f in os.listdir("templates/code"):
-                    if f.endswith(".html"):
-                        name = f.replace(".html", "").replace("_", " ").title()
-                        # Read HTML
-                        with open(f"templates/code/{f}", "r", encoding="utf-8") as hf:
-                            html_content = hf.read()
-                        
-                        # Read Image
-                        img_name = f.replace(".html", ".png")
-                        img_path = f"templates/img/{img_name}"
-                        img_data = b""
-                        if os.path.exists(img_path):
-                            with open(img_path, "rb") as imgf:
-                                img_data = imgf.read()
-                        
-                        session.add(Template(name=name, html_content=html_content, image_data=img_data))
-                session.commit()
+    create_search_tables()
+    app_state["init_task"] = asyncio.create_task(asyncio.to_thread(_initialize))
+
+@app.on_event("shutdown")
+async def on_shutdown():
+    await async_engine.dispose()
+
+# Health checks
+@app.get("/healthz")
+async def healthz():
+    return {"status": "ok"}
+
+@app.get("/readyz")
+async def readyz():
+    if not app_state["ready"]:
+        raise HTTPException(status_code=503, detail="Starting up")
+    try:
+        async with async_engine.connect() as conn:
+            await conn.execute(text("SELECT 1"))
+    except Exception as e:
+        logger.error(f"Readiness check failed: {e}")
+        raise HTTPException(status_code=503, detail="Database unavailable")
+    return {"status": "ready", "search_index": "ready" if app_state["search_indexed"] else "backfilling"}
 
 
 # Auth Configuration
@@ -74,8 +87,16 @@ def get_current_user(token: str = Depends(oauth2_scheme)):
     user = payload.get("sub")
     if not user:
         raise HTTPException(status_code=401, detail="Invalid token")
+    trace = current_trace()
+    if trace:
+        trace.user = user
     return user
 
+def get_admin_user(current_user: str = Depends(get_current_user)):
+    if not is_admin(current_user):
+        raise HTTPException(status_code=403, detail="Admin only")
+    return current_user
+
 # Models API
 class GenerateRequest(BaseModel):
     keyword: str
@@ -94,8 +115,8 @@ class TemplateInfo(BaseModel):
     img_path: str # Changed back to match frontend expectation
 
 @app.get("/api/templates", response_model=List[TemplateInfo])
-async def get_templates(current_user: str = Depends(get_current_user), session: Session = Depends(get_session)):
-    templates = session.exec(select(Template)).all()
+async def get_templates(current_user: str = Depends(get_current_user), session: AsyncSession = Depends(get_async_session)):
+    templates = (await session.exec(select(Template))).all()
     result = []
     
     for t in templates:
@@ -123,8 +144,24 @@ class HistoryItem(BaseModel):
     inputs: dict
     result: Optional[str]
 
+class HistorySearchHit(BaseModel):
+    id: int
+    date: str
+    keyword: str
+    snippet: str # HTML-escaped matched text with <mark> highlights
+    rank: float
+
+class HistorySearchResponse(BaseModel):
+    total: int # Counted up to SEARCH_MAX_RESULTS
+    total_capped: bool # True when there are more hits than total
+    items: List[HistorySearchHit]
+
+class PrefetchRequest(BaseModel):
+    url: str
+
 # Scraper instance
 scraper = UltimateScraper()
+prefetcher = ScrapePrefetcher(scraper)
 
 # Login Endpoint
 @app.post("/token")
@@ -145,9 +182,9 @@ async def verify_token_endpoint(current_user: str = Depends(get_current_user)):
 
 # API Endpoints for Prompts
 @app.get("/api/prompts", response_model=PromptsData)
-async def get_prompts(current_user: str = Depends(get_current_user), session: Session = Depends(get_session)):
-    p_claude = session.exec(select(Prompt).where(Prompt.key == "claude")).first()
-    p_gemini = session.exec(select(Prompt).where(Prompt.key == "gemini")).first()
+async def get_prompts(current_user: str = Depends(get_current_user), session: AsyncSession = Depends(get_async_session)):
+    p_claude = (await session.exec(select(Prompt).where(Prompt.key == "claude"))).first()
+    p_gemini = (await session.exec(select(Prompt).where(Prompt.key == "gemini"))).first()
     
     return PromptsData(
         system_prompt_claude=p_claude.content if p_claude else "",
@@ -155,9 +192,9 @@ async def get_prompts(current_user: str = Depends(get_current_user), session: Se
     )
 
 @app.post("/api/prompts")
-async def save_prompts(data: PromptsData, current_user: str = Depends(get_current_user), session: Session = Depends(get_session)):
+async def save_prompts(data: PromptsData, current_user: str = Depends(get_current_user), session: AsyncSession = Depends(get_async_session)):
     # Upsert Claude
-    p_claude = session.exec(select(Prompt).where(Prompt.key == "claude")).first()
+    p_claude = (await session.exec(select(Prompt).where(Prompt.key == "claude"))).first()
     if not p_claude:
         p_claude = Prompt(key="claude", content=data.system_prompt_claude)
         session.add(p_claude)
@@ -166,7 +203,7 @@ async def save_prompts(data: PromptsData, current_user: str = Depends(get_curren
         session.add(p_claude)
         
     # Upsert Gemini
-    p_gemini = session.exec(select(Prompt).where(Prompt.key == "gemini")).first()
+    p_gemini = (await session.exec(select(Prompt).where(Prompt.key == "gemini"))).first()
     if not p_gemini:
         p_gemini = Prompt(key="gemini", content=data.system_prompt_gemini)
         session.add(p_gemini)
@@ -174,7 +211,8 @@ async def save_prompts(data: PromptsData, current_user: str = Depends(get_curren
         p_gemini.content = data.system_prompt_gemini
         session.add(p_gemini)
     
-    session.commit()
+    with span("db.save_prompts"):
+        await session.commit()
     return {"status": "success"}
 
 # API Endpoints for Templates
@@ -183,7 +221,7 @@ async def create_template(
     html_content: str = Form(...),
     image: UploadFile = File(...),
     current_user: str = Depends(get_current_user),
-    session: Session = Depends(get_session)
+    session: AsyncSession = Depends(get_async_session)
 ):
     try:
         img_data = await image.read()
@@ -192,13 +230,14 @@ async def create_template(
         
         # We try to parse name from html title if possible or just generic
         # Let's count existing
-        count = len(session.exec(select(Template)).all())
+        count = (await session.exec(select(func.count()).select_from(Template))).one()
         name = f"Plantilla {count + 1}"
 
         new_tmpl = Template(name=name, html_content=html_content, image_data=img_data)
-        session.add(new_tmpl)
-        session.commit()
-        session.refresh(new_tmpl)
+        with span("db.create_template"):
+            session.add(new_tmpl)
+            await session.commit()
+            await session.refresh(new_tmpl)
             
         return {"status": "success", "id": new_tmpl.id}
     except Exception as e:
@@ -206,22 +245,23 @@ async def create_template(
         raise HTTPException(status_code=500, detail=str(e))
 
 @app.delete("/api/templates/{template_id}")
-async def delete_template(template_id: int, current_user: str = Depends(get_current_user), session: Session = Depends(get_session)):
-    tmpl = session.get(Template, template_id)
+async def delete_template(template_id: int, current_user: str = Depends(get_current_user), session: AsyncSession = Depends(get_async_session)):
+    tmpl = await session.get(Template, template_id)
     if not tmpl:
         raise HTTPException(status_code=404, detail="Template not found")
-    session.delete(tmpl)
-    session.commit()
+    with span("db.delete_template"):
+        await session.delete(tmpl)
+        await session.commit()
     return {"status": "deleted"}
 
 
 
 # Endpoint for History
 @app.get("/api/history", response_model=List[HistoryItem])
-async def get_history(current_user: str = Depends(get_current_user), session: Session = Depends(get_session)):
+async def get_history(current_user: str = Depends(get_current_user), session: AsyncSession = Depends(get_async_session)):
     # Get history for user, ordered by date desc (using created_at_ts ideally)
     # For now we order by ID desc
-    history = session.exec(select(History).where(History.user_id == current_user).order_by(History.id.desc())).all()
+    history = (await session.exec(select(History).where(History.user_id == current_user).order_by(History.id.desc()))).all()
     
     res = []
     for h in history:
@@ -237,8 +277,14 @@ async def get_history(current_user: str = Depends(get_current_user), session: Se
         ))
     return res
 
+@app.get("/api/history/search", response_model=HistorySearchResponse)
+async def search_history_endpoint(q: str, limit: int = 20, offset: int = 0, current_user: str = Depends(get_current_user), session: AsyncSession = Depends(get_async_session)):
+    # Ranked full-text search over keyword, brief, source URL and generated FAQ text
+    total, capped, hits = await search_history(session, current_user, q, limit, offset)
+    return HistorySearchResponse(total=total, total_capped=capped, items=[HistorySearchHit(**hit) for hit in hits])
+
 @app.post("/api/history")
-async def save_history(item: HistoryItem, current_user: str = Depends(get_current_user), session: Session = Depends(get_session)):
+async def save_history(item: HistoryItem, current_user: str = Depends(get_current_user), session: AsyncSession = Depends(get_async_session)):
     # We ignore item.id for creation usually, or handle update
     # Frontend sends an ID timestamp usually
     
@@ -252,38 +298,43 @@ async def save_history(item: HistoryItem, current_user: str = Depends(get_curren
         result_html=item.result,
         created_at_ts=int(item.id // 1000) if item.id else 0 # Use frontend TS or generated, convert to seconds
     )
-    session.add(new_h)
-    session.commit()
+    with span("db.save_history"):
+        session.add(new_h)
+        await session.flush()
+        await index_history(session, new_h)
+        await session.commit()
     logger.info(f"History saved with ID: {new_h.id}")
     return {"status": "success", "id": new_h.id}
 
 @app.delete("/api/history/{id}")
-async def delete_history(id: int, current_user: str = Depends(get_current_user), session: Session = Depends(get_session)):
+async def delete_history(id: int, current_user: str = Depends(get_current_user), session: AsyncSession = Depends(get_async_session)):
     # We need to find by created_at_ts likely if frontend uses TS as ID, OR we change frontend to use DB ID.
     # Frontend logic: id is Date.now(). Let's assume we match that to created_at_ts OR we change frontend to use DB ID.
     # To be safest: let's try to find by ID (if we updated frontend) OR created_at_ts.
     # But wait, frontend sends "id" which is a timestamp.
     
     # Try finding by TS
-    h = session.exec(select(History).where(History.user_id == current_user).where(History.created_at_ts == id)).first()
+    h = (await session.exec(select(History).where(History.user_id == current_user).where(History.created_at_ts == id))).first()
     if not h:
          # Try by DB ID just in case
-        h = session.get(History, id)
+        h = await session.get(History, id)
     
     if h and h.user_id == current_user:
-        session.delete(h)
-        session.commit()
+        with span("db.delete_history"):
+            await remove_history(session, h.id)
+            await session.delete(h)
+            await session.commit()
         return {"status": "deleted"}
     
     raise HTTPException(status_code=404, detail="Item not found")
 
 @app.put("/api/history/{id}")
-async def update_history_name(id: int, kw_wrapper: Dict[str, str], current_user: str = Depends(get_current_user), session: Session = Depends(get_session)):
+async def update_history_name(id: int, kw_wrapper: Dict[str, str], current_user: str = Depends(get_current_user), session: AsyncSession = Depends(get_async_session)):
     # kw_wrapper = {"keyword": "new name"}
     # Match logic from delete
-    h = session.exec(select(History).where(History.user_id == current_user).where(History.created_at_ts == id)).first()
+    h = (await session.exec(select(History).where(History.user_id == current_user).where(History.created_at_ts == id))).first()
     if not h:
-        h = session.get(History, id)
+        h = await session.get(History, id)
 
     if h and h.user_id == current_user:
         h.keyword = kw_wrapper.get("keyword", h.keyword)
@@ -294,23 +345,39 @@ async def update_history_name(id: int, kw_wrapper: Dict[str, str], current_user:
             h.inputs_json = json.dumps(inp)
         except: pass
         
-        session.add(h)
-        session.commit()
+        with span("db.update_history"):
+            session.add(h)
+            await session.flush()
+            await index_history(session, h)
+            await session.commit()
         return {"status": "updated"}
         
     raise HTTPException(status_code=404, detail="Item not found")
 
 
+@app.post("/api/prefetch")
+async def prefetch_url(request: PrefetchRequest, current_user: str = Depends(get_current_user)):
+    # Called by the frontend when the URL field loses focus
+    if not request.url.strip():
+        raise HTTPException(status_code=400, detail="No URL provided.")
+    return {"status": prefetcher.start(request.url, current_user)}
+
 @app.post("/api/generate", response_model=GenerateResponse)
-async def generate_faqs(request: GenerateRequest, current_user: str = Depends(get_current_user), session: Session = Depends(get_session)):
+async def generate_faqs(request: GenerateRequest, current_user: str = Depends(get_current_user), session: AsyncSession = Depends(get_async_session)):
     try:
         logger.info(f"Received generation request for keyword: {request.keyword}")
         
         # Step 1: Content Acquisition (Client logic or scrape)
         web_content = ""
         if request.source_type == "url":
-            logger.info("Scraping URL...")
-            scrape_result = await scraper.scrape(request.source_content)
+            # Reuse a prefetch started when the URL was typed, if any
+            with span("scrape.prefetch_wait"):
+                scrape_result = await prefetcher.get(request.source_content)
+            if scrape_result:
+                logger.info("Using prefetched scrape result.")
+            else:
+                logger.info("Scraping URL...")
+                scrape_result = await scraper.scrape(request.source_content)
             if not scrape_result:
                 raise HTTPException(status_code=400, detail="Failed to scrape URL or invalid content.")
             web_content = scrape_result.get("full_text", "")
@@ -324,10 +391,12 @@ async def generate_faqs(request: GenerateRequest, current_user: str = Depends(ge
 
         # Step 2: Generate FAQ Text (Claude)
         logger.info("Generating FAQ text with Claude...")
-        faq_texts = generate_faqs_text(request.keyword, request.brief, web_content)
+        # LLM calls and prompt loading are sync, keep them off the event loop
+        faq_texts = await asyncio.to_thread(generate_faqs_text, request.keyword, request.brief, web_content)
         
         # Step 3: Get Template from DB
-        template = session.get(Template, request.template_id)
+        with span("db.load_template"):
+            template = await session.get(Template, request.template_id)
         if not template:
              raise HTTPException(status_code=404, detail="Template not found.")
              
@@ -335,7 +404,7 @@ async def generate_faqs(request: GenerateRequest, current_user: str = Depends(ge
             
         # Step 4: Generate Final HTML (Gemini)
         logger.info("Merging with template using Gemini...")
-        final_html = generate_final_html(template_html, faq_texts)
+        final_html = await asyncio.to_thread(generate_final_html, template_html, faq_texts)
         
         return GenerateResponse(html_content=final_html)
 
@@ -343,6 +412,17 @@ async def generate_faqs(request: GenerateRequest, current_user: str = Depends(ge
         logger.error(f"Error in generation: {str(e)}")
         raise HTTPException(status_code=500, detail=str(e))
 
+# Admin: tracing
+@app.get("/api/admin/slow-generations")
+async def slow_generations(limit: int = Query(20, ge=1, le=TRACE_BUFFER_SIZE), admin_user: str = Depends(get_admin_user)):
+    # Slowest recent traced generations with their span breakdown
+    return slowest_traces(limit)
+
+@app.post("/api/admin/profile-next")
+async def profile_next_generations(count: int = Query(1, ge=1, le=PROFILE_NEXT_MAX), admin_user: str = Depends(get_admin_user)):
+    # Profile the next `count` generations; profiles go to logs/profiles/<trace id>.folded
+    return {"pending": request_profile_next(count)}
+
 # Mount Static Files
 app.mount("/static", StaticFiles(directory="static"), name="static")
 
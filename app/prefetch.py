@@ -0,0 +1,143 @@
+import os
+import time
+import asyncio
+from urllib.parse import urlparse, urlunparse
+from app.utils import logger
+from app.tracing import detach_trace
+
+# Speculative scraping: the frontend asks for a prefetch when the URL field
+# loses focus, and /api/generate reuses the in-flight or finished result.
+
+PREFETCH_TTL_SECONDS = int(os.environ.get("PREFETCH_TTL_SECONDS", "600")) # Results are dropped this long after the scrape finished
+PREFETCH_TIMEOUT_SECONDS = int(os.environ.get("PREFETCH_TIMEOUT_SECONDS", "120")) # In-flight scrapes are cancelled after this
+PREFETCH_MAX_PER_USER = int(os.environ.get("PREFETCH_MAX_PER_USER", "3")) # Concurrent in-flight prefetches per user
+PREFETCH_MAX_BYTES = int(os.environ.get("PREFETCH_MAX_BYTES", str(32 * 1024 * 1024))) # Total size of cached results
+
+def normalize_url(url):
+    """
+    Cache key for a URL: scheme added if missing, host lowercased, fragment and trailing slash dropped.
+    """
+    url = url.strip()
+    if not urlparse(url).scheme:
+        url = f"https://{url}"
+    parsed = urlparse(url)
+    path = parsed.path.rstrip("/")
+    return urlunparse((parsed.scheme.lower(), parsed.netloc.lower(), path, parsed.params, parsed.query, ""))
+
+def _result_size(result):
+    if not result:
+        return 0
+    return sum(len(str(v).encode("utf-8")) for v in result.values())
+
+class _Entry:
+    def __init__(self, user, task):
+        self.user = user
+        self.task = task
+        self.created = time.monotonic()
+        self.last_used = self.created
+        self.finished = None
+        self.size = 0
+
+class ScrapePrefetcher:
+    def __init__(self, scraper):
+        self.scraper = scraper
+        self.entries = {}
+        self.total_bytes = 0
+
+    def _in_flight(self, user):
+        return sum(1 for e in self.entries.values() if e.user == user and not e.task.done())
+
+    def _drop(self, key):
+        entry = self.entries.pop(key, None)
+        if not entry:
+            return
+        if not entry.task.done():
+            entry.task.cancel()
+        self.total_bytes -= entry.size
+
+    def _evict(self):
+        now = time.monotonic()
+        for key, entry in list(self.entries.items()):
+            if entry.task.done():
+                # Measured from the scrape, not last use, so a hot URL is still refreshed
+                if entry.finished is None or now - entry.finished > PREFETCH_TTL_SECONDS:
+                    self._drop(key)
+            elif now - entry.created > PREFETCH_TIMEOUT_SECONDS:
+                logger.info(f"Prefetch timed out, cancelling: {key}")
+                self._drop(key)
+
+        # Over the memory budget: drop least recently used finished results
+        if self.total_bytes > PREFETCH_MAX_BYTES:
+            done = sorted((e.last_used, k) for k, e in self.entries.items() if e.task.done())
+            for _, key in done:
+                if self.total_bytes <= PREFETCH_MAX_BYTES:
+                    break
+                self._drop(key)
+
+    async def _run(self, key, url):
+        # Outlives the /api/prefetch request, keep its spans out of that trace
+        detach_trace()
+        try:
+            result = await asyncio.wait_for(self.scraper.scrape(url), PREFETCH_TIMEOUT_SECONDS)
+        except asyncio.TimeoutError:
+            result = None
+        except Exception as e:
+            logger.error(f"Prefetch failed for {url}: {e}")
+            result = None
+
+        entry = self.entries.get(key)
+        if entry and entry.task is asyncio.current_task():
+            if result:
+                entry.finished = time.monotonic()
+                entry.size = _result_size(result)
+                self.total_bytes += entry.size
+                self._evict()
+            else:
+                # Keep failures out of the table so /api/generate scrapes again
+                self.entries.pop(key, None)
+        return result
+
+    def start(self, url, user):
+        """
+        Starts a background scrape unless one is already cached or running.
+        Returns "cached", "running", "started" or "limited".
+        """
+        self._evict()
+        key = normalize_url(url)
+        entry = self.entries.get(key)
+        if entry:
+            entry.last_used = time.monotonic()
+            return "running" if not entry.task.done() else "cached"
+
+        if self._in_flight(user) >= PREFETCH_MAX_PER_USER:
+            return "limited"
+
+        task = asyncio.create_task(self._run(key, url))
+        self.entries[key] = _Entry(user, task)
+        logger.info(f"Prefetch started for {key}")
+        return "started"
+
+    async def get(self, url):
+        """
+        Result of a prefetch for this URL, waiting for it if still running (at most
+        until its own PREFETCH_TIMEOUT_SECONDS deadline). Returns None when there is no usable prefetch.
+        """
+        self._evict()
+        key = normalize_url(url)
+        entry = self.entries.get(key)
+        if not entry:
+            return None
+        entry.last_used = time.monotonic()
+        remaining = entry.created + PREFETCH_TIMEOUT_SECONDS - time.monotonic()
+        try:
+            # Shielded so neither a cancelled request nor the timeout below kills
+            # a scrape other requests may share
+            return await asyncio.wait_for(asyncio.shield(entry.task), max(remaining, 0))
+        except asyncio.TimeoutError:
+            # Past its deadline: _run's own timeout ends it, the caller scrapes again
+            logger.info(f"Prefetch past its deadline, not waiting: {key}")
+            return None
+        except asyncio.CancelledError:
+            if entry.task.cancelled():
+                return None
+            raise
@@ -1,11 +1,12 @@
 import sys
 import time
+import asyncio
 import random
-import trafilatura
 from urllib.parse import urlparse
-from lxml import html
-import requests as std_requests
-from curl_cffi import requests as cffi_requests
+from app.tracing import span
+
+# trafilatura, lxml, requests and curl_cffi are imported inside the methods that
+# use them so that importing this module (and app.main) stays cheap on boot.
 
 
 class UltimateScraper:
@@ -42,6 +43,7 @@ class UltimateScraper:
 
     def _extract_h1(self, html_content):
         try:
+            from lxml import html
             tree = html.fromstring(html_content)
             h1 = tree.xpath('//h1//text()')
             if h1:
@@ -51,16 +53,20 @@ class UltimateScraper:
             return "Error extrayendo H1"
 
     def _process_html(self, html_content, url, status_code=200):
+        import trafilatura
+
         # Decode bytes if necessary
         if isinstance(html_content, bytes):
             html_content = html_content.decode('utf-8', errors='ignore')
             
-        text = trafilatura.extract(html_content, include_comments=False)
+        with span("scrape.extract"):
+            text = trafilatura.extract(html_content, include_comments=False)
         
         if not self._is_valid_content(text):
             return None
             
-        h1_text = self._extract_h1(html_content)
+        with span("scrape.extract_h1"):
+            h1_text = self._extract_h1(html_content)
 
         return {
             "url": url,
@@ -71,6 +77,7 @@ class UltimateScraper:
     def _level_1_standard(self, url):
         print("   🔹 Ejecutando Nivel 1 (Requests Estándar)...")
         try:
+            import requests as std_requests
             headers = {'User-Agent': random.choice(self.user_agents)}
             response = std_requests.get(url, headers=headers, timeout=5, verify=False)
             
@@ -86,6 +93,7 @@ class UltimateScraper:
     def _level_2_stealth(self, url):
         print("   🔸 Escalando a Nivel 2 (TLS Impersonation)...")
         try:
+            from curl_cffi import requests as cffi_requests
             response = cffi_requests.get(url, impersonate="chrome110", timeout=10)
             return self._process_html(response.text, url, response.status_code)
         except Exception as e:
@@ -110,7 +118,8 @@ class UltimateScraper:
                     await page.wait_for_timeout(2000)
                     content = await page.content()
                     
-                    result = self._process_html(content, url)
+                    # trafilatura can take seconds on huge pages
+                    result = await asyncio.to_thread(self._process_html, content, url)
                     
                     await browser.close()
                     return result
@@ -125,15 +134,18 @@ class UltimateScraper:
         final_url = self._normalize_url(url)
         print(f"\n🚀 Iniciando extracción para: {final_url}")
         
-        # Level 1 and 2 are sync, running them directly is "blocking" but fast enough or acceptable
-        # If we wanted perfection we'd run them in executor, but let's keep it simple
-        result = self._level_1_standard(final_url)
+        # Level 1 and 2 are sync, run them in a worker thread so background
+        # prefetches do not block the event loop
+        with span("scrape.level1"):
+            result = await asyncio.to_thread(self._level_1_standard, final_url)
         if result: return result
         
-        result = self._level_2_stealth(final_url)
+        with span("scrape.level2"):
+            result = await asyncio.to_thread(self._level_2_stealth, final_url)
         if result: return result
         
-        result = await self._level_3_nuclear(final_url)
+        with span("scrape.level3"):
+            result = await self._level_3_nuclear(final_url)
         if result: return result
         
         return None
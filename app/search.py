@@ -0,0 +1,345 @@
+import os
+import re
+import json
+import html
+import hashlib
+from html.parser import HTMLParser
+from sqlalchemy import text
+from app.utils import logger
+from app.database import engine, IS_SQLITE, History, SeedState, Session, select
+
+# Full-text index over generation history.
+# SQLite: FTS5 virtual table keyed by history.id (rowid).
+# Postgres: side table with a weighted tsvector and a GIN index.
+# Both are kept in sync from the history endpoints (insert, rename, delete);
+# rows that predate the index are backfilled in the background after startup.
+
+# Text search configuration for Postgres. 'simple' works for any language.
+SEARCH_TS_CONFIG = os.environ.get("SEARCH_TS_CONFIG", "simple")
+SEARCH_MAX_LIMIT = 100
+# Totals are counted up to this many hits and pages stop there
+SEARCH_MAX_RESULTS = int(os.environ.get("SEARCH_MAX_RESULTS", "1000"))
+# Only the most recent matches are ranked, which bounds the cost of very common terms
+SEARCH_RANK_WINDOW = max(int(os.environ.get("SEARCH_RANK_WINDOW", "2000")), SEARCH_MAX_RESULTS)
+BACKFILL_BATCH = 500
+# Bump when the index layout changes; the SQLite index is then rebuilt
+SEARCH_INDEX_VERSION = "2"
+
+# Private-use characters marking matches in raw snippets. The snippet text is
+# HTML-escaped first and only then are these swapped for <mark> tags.
+MARK_START = "\ue000"
+MARK_END = "\ue001"
+
+# owner holds a per-user token so MATCH itself filters by user before ranking.
+# prefix= builds prefix indexes for the "term*" queries.
+SQLITE_DDL = [
+    """CREATE VIRTUAL TABLE IF NOT EXISTS history_fts USING fts5(
+        keyword, brief, source_url, faq_text, owner,
+        tokenize = 'unicode61 remove_diacritics 2',
+        prefix = '2 3 4'
+    )""",
+    # Default rank; weights follow the column order, owner does not count
+    "INSERT INTO history_fts (history_fts, rank) VALUES ('rank', 'bm25(10.0, 4.0, 4.0, 1.0, 0.0)')",
+]
+SQLITE_DROP = "DROP TABLE IF EXISTS history_fts"
+
+POSTGRES_DDL = [
+    """CREATE TABLE IF NOT EXISTS history_search (
+        history_id INTEGER PRIMARY KEY REFERENCES history(id) ON DELETE CASCADE,
+        user_id TEXT NOT NULL,
+        body TEXT NOT NULL,
+        document TSVECTOR NOT NULL
+    )""",
+    "CREATE INDEX IF NOT EXISTS ix_history_search_document ON history_search USING GIN (document)",
+    "CREATE INDEX IF NOT EXISTS ix_history_search_user_id ON history_search (user_id)",
+]
+
+SQLITE_UPSERT = [
+    "DELETE FROM history_fts WHERE rowid = :id",
+    """INSERT INTO history_fts (rowid, keyword, brief, source_url, faq_text, owner)
+       VALUES (:id, :keyword, :brief, :source_url, :faq_text, :owner)""",
+]
+
+POSTGRES_UPSERT = [
+    f"""INSERT INTO history_search (history_id, user_id, body, document)
+        VALUES (:id, :user_id, :body,
+            setweight(to_tsvector('{SEARCH_TS_CONFIG}', :keyword), 'A') ||
+            setweight(to_tsvector('{SEARCH_TS_CONFIG}', :brief), 'B') ||
+            setweight(to_tsvector('{SEARCH_TS_CONFIG}', :source_url), 'B') ||
+            setweight(to_tsvector('{SEARCH_TS_CONFIG}', :faq_text), 'C'))
+        ON CONFLICT (history_id) DO UPDATE
+        SET user_id = EXCLUDED.user_id, body = EXCLUDED.body, document = EXCLUDED.document""",
+]
+
+SQLITE_DELETE = "DELETE FROM history_fts WHERE rowid = :id"
+POSTGRES_DELETE = "DELETE FROM history_search WHERE history_id = :id"
+
+# Counting stops at :cap, so a common term does not scan every match
+SQLITE_COUNT = """
+    SELECT count(*) FROM (SELECT 1 FROM history_fts WHERE history_fts MATCH :query LIMIT :cap)
+"""
+# Oldest rowid of the :window most recent matches (rowid order is native to FTS5)
+SQLITE_FLOOR = """
+    SELECT rowid FROM history_fts WHERE history_fts MATCH :query
+    ORDER BY rowid DESC LIMIT 1 OFFSET :window
+"""
+# Rank inside the window, then build snippets only for the page of hits
+SQLITE_SEARCH = """
+    SELECT h.id, h.date, h.keyword, h.created_at_ts, hits.rank,
+           snippet(history_fts, -1, :mark_start, :mark_end, '…', 16) AS snippet
+    FROM (
+        SELECT rowid, rank FROM history_fts
+        WHERE history_fts MATCH :query AND rowid >= :floor
+        ORDER BY rank
+        LIMIT :limit OFFSET :offset
+    ) hits
+    JOIN history_fts ON history_fts.rowid = hits.rowid AND history_fts MATCH :query
+    JOIN history h ON h.id = hits.rowid
+    WHERE h.user_id = :user_id
+    ORDER BY hits.rank
+"""
+
+POSTGRES_COUNT = f"""
+    SELECT count(*) FROM (
+        SELECT 1 FROM history_search s
+        WHERE s.document @@ to_tsquery('{SEARCH_TS_CONFIG}', :query) AND s.user_id = :user_id
+        LIMIT :cap
+    ) matches
+"""
+POSTGRES_FLOOR = f"""
+    SELECT s.history_id FROM history_search s
+    WHERE s.document @@ to_tsquery('{SEARCH_TS_CONFIG}', :query) AND s.user_id = :user_id
+    ORDER BY s.history_id DESC
+    OFFSET :window LIMIT 1
+"""
+# ts_headline is costly, so it only runs on the page of hits
+POSTGRES_SEARCH = f"""
+    SELECT hits.id, hits.date, hits.keyword, hits.created_at_ts, hits.rank,
+           ts_headline('{SEARCH_TS_CONFIG}', hits.body, to_tsquery('{SEARCH_TS_CONFIG}', :query),
+                       :headline_options) AS snippet
+    FROM (
+        SELECT h.id, h.date, h.keyword, h.created_at_ts, s.body,
+               ts_rank_cd(s.document, to_tsquery('{SEARCH_TS_CONFIG}', :query)) AS rank
+        FROM history_search s
+        JOIN history h ON h.id = s.history_id
+        WHERE s.document @@ to_tsquery('{SEARCH_TS_CONFIG}', :query) AND s.user_id = :user_id
+          AND s.history_id >= :floor
+        ORDER BY rank DESC, h.id DESC
+        LIMIT :limit OFFSET :offset
+    ) hits
+    ORDER BY hits.rank DESC, hits.id DESC
+"""
+
+class _TextExtractor(HTMLParser):
+    def __init__(self):
+        super().__init__()
+        self.parts = []
+        self._skip = 0
+
+    def handle_starttag(self, tag, attrs):
+        if tag in ("script", "style"):
+            self._skip += 1
+
+    def handle_endtag(self, tag):
+        if tag in ("script", "style") and self._skip:
+            self._skip -= 1
+
+    def handle_data(self, data):
+        if not self._skip and data.strip():
+            self.parts.append(data.strip())
+
+def html_to_text(html_content):
+    """
+    Visible text of the generated FAQ HTML.
+    """
+    if not html_content:
+        return ""
+    parser = _TextExtractor()
+    parser.feed(html_content)
+    parser.close()
+    return " ".join(parser.parts)
+
+def _strip_marks(value):
+    return value.replace(MARK_START, "").replace(MARK_END, "")
+
+def render_snippet(raw):
+    """
+    Escapes a raw snippet and turns the match markers into <mark> tags.
+    """
+    escaped = html.escape(raw or "")
+    return escaped.replace(MARK_START, "<mark>").replace(MARK_END, "</mark>")
+
+def owner_token(user_id):
+    """
+    Single alphanumeric token identifying a user inside the FTS index.
+    """
+    return "u" + hashlib.sha1(user_id.encode("utf-8")).hexdigest()[:20]
+
+def _document(h):
+    try:
+        inputs = json.loads(h.inputs_json)
+    except Exception:
+        inputs = {}
+    return {
+        "id": h.id,
+        "user_id": h.user_id,
+        "keyword": _strip_marks(h.keyword or ""),
+        "brief": _strip_marks(inputs.get("brief") or ""),
+        "source_url": _strip_marks(inputs.get("url") or ""),
+        "faq_text": _strip_marks(html_to_text(h.result_html)),
+    }
+
+def _upsert_params(h):
+    params = _document(h)
+    if IS_SQLITE:
+        params["owner"] = owner_token(h.user_id)
+    else:
+        params["body"] = " ".join(v for v in (params["keyword"], params["brief"], params["faq_text"]) if v)
+    return params
+
+def _query_terms(q):
+    return re.findall(r"\w+", q.lower())
+
+def build_query(q, user_id):
+    """
+    Turns free text into a safe query for the active backend. Only the last term
+    is a prefix (search as you type), and only from two characters on, which is
+    what the prefix indexes cover. Returns None when the text has no searchable terms.
+    """
+    terms = _query_terms(q)
+    if not terms:
+        return None
+    last = terms[-1]
+    prefix = len(last) >= 2
+    if IS_SQLITE:
+        parts = [f'"{t}"' for t in terms[:-1]] + [f'"{last}"*' if prefix else f'"{last}"']
+        return f'owner : "{owner_token(user_id)}" AND {{keyword brief source_url faq_text}} : ({" ".join(parts)})'
+    parts = terms[:-1] + [f"{last}:*" if prefix else last]
+    return " & ".join(parts)
+
+def _get_state(session, key):
+    state = session.get(SeedState, key)
+    return state.digest if state else None
+
+def _set_state(session, key, value):
+    state = session.get(SeedState, key) or SeedState(key=key, digest=value)
+    state.digest = value
+    session.add(state)
+
+def create_search_tables():
+    """
+    Creates the index structures, rebuilding the SQLite index when its layout
+    changed. Fast; runs inline on startup so the history endpoints can write to it.
+    """
+    with Session(engine) as session:
+        if _get_state(session, "search_schema") != SEARCH_INDEX_VERSION:
+            if IS_SQLITE:
+                session.execute(text(SQLITE_DROP))
+            _set_state(session, "search_backfill", "")
+        for ddl in (SQLITE_DDL if IS_SQLITE else POSTGRES_DDL):
+            session.execute(text(ddl))
+        _set_state(session, "search_schema", SEARCH_INDEX_VERSION)
+        session.commit()
+
+def search_index_ready():
+    with Session(engine) as session:
+        return _get_state(session, "search_backfill") == SEARCH_INDEX_VERSION
+
+def backfill_search_index():
+    """
+    Indexes history rows written before the index existed. Runs once per index
+    version in the background after startup, walking history by id; the upserts are
+    idempotent, so rows the endpoints index meanwhile are simply rewritten.
+    """
+    if search_index_ready():
+        return
+    logger.info("Backfilling search index...")
+    last_id, total, failures = 0, 0, 0
+    upserts = SQLITE_UPSERT if IS_SQLITE else POSTGRES_UPSERT
+    while True:
+        with Session(engine) as session:
+            batch = session.exec(
+                select(History).where(History.id > last_id).order_by(History.id).limit(BACKFILL_BATCH)
+            ).all()
+            if not batch:
+                _set_state(session, "search_backfill", SEARCH_INDEX_VERSION)
+                session.commit()
+                break
+            params = [_upsert_params(h) for h in batch]
+            try:
+                for stmt in upserts:
+                    session.execute(text(stmt), params)
+                session.commit()
+            except Exception as e:
+                # e.g. a row deleted meanwhile (Postgres FK); the retry re-reads the batch
+                session.rollback()
+                failures += 1
+                if failures > 3:
+                    logger.error(f"Search backfill stopped, will resume on next boot: {e}")
+                    return
+                continue
+            failures = 0
+            last_id = batch[-1].id
+            total += len(batch)
+    logger.info(f"Search index backfilled ({total} history entries).")
+
+async def index_history(session, h):
+    """
+    Adds or refreshes the index entry of a history row. Does not commit, so it
+    goes in the same transaction as the row change.
+    """
+    params = _upsert_params(h)
+    for stmt in (SQLITE_UPSERT if IS_SQLITE else POSTGRES_UPSERT):
+        await session.execute(text(stmt), params)
+
+async def remove_history(session, history_id):
+    """
+    Drops the index entry of a history row. Does not commit.
+    """
+    await session.execute(text(SQLITE_DELETE if IS_SQLITE else POSTGRES_DELETE), {"id": history_id})
+
+async def search_history(session, user_id, q, limit=20, offset=0):
+    """
+    Ranked search over a user's history. Returns (total, total_capped, hits);
+    total stops counting at SEARCH_MAX_RESULTS and pages end there.
+    """
+    query = build_query(q, user_id)
+    if query is None:
+        return 0, False, []
+    offset = max(0, offset)
+    limit = max(1, min(limit, SEARCH_MAX_LIMIT, SEARCH_MAX_RESULTS - offset))
+    params = {"query": query, "user_id": user_id}
+
+    total = (await session.execute(
+        text(SQLITE_COUNT if IS_SQLITE else POSTGRES_COUNT), {**params, "cap": SEARCH_MAX_RESULTS + 1}
+    )).scalar_one()
+    capped = total > SEARCH_MAX_RESULTS
+    total = min(total, SEARCH_MAX_RESULTS)
+    if total == 0 or offset >= total:
+        return total, capped, []
+
+    floor = 0
+    if capped:
+        floor = (await session.execute(
+            text(SQLITE_FLOOR if IS_SQLITE else POSTGRES_FLOOR), {**params, "window": SEARCH_RANK_WINDOW - 1}
+        )).scalar() or 0
+
+    params.update(floor=floor, limit=limit, offset=offset)
+    if IS_SQLITE:
+        params.update(mark_start=MARK_START, mark_end=MARK_END)
+    else:
+        params["headline_options"] = f"StartSel={MARK_START}, StopSel={MARK_END}, MaxWords=24, MinWords=8, MaxFragments=1"
+    rows = (await session.execute(text(SQLITE_SEARCH if IS_SQLITE else POSTGRES_SEARCH), params)).mappings().all()
+    hits = [
+        {
+            "id": r["id"],
+            "date": r["date"],
+            "keyword": r["keyword"],
+            "created_at_ts": r["created_at_ts"],
+            # bm25 is lower-is-better; flip it so higher is better on both backends
+            "rank": -r["rank"] if IS_SQLITE else r["rank"],
+            "snippet": render_snippet(r["snippet"]),
+        }
+        for r in rows
+    ]
+    return total, capped, hits
@@ -0,0 +1,200 @@
+import os
+import sys
+import json
+import hashlib
+import subprocess
+import threading
+from app.utils import logger
+from app.database import engine, Prompt, Template, SeedState, Session, select
+
+PROMPTS_FILE = "prompts.json"
+TEMPLATES_CODE_DIR = "templates/code"
+TEMPLATES_IMG_DIR = "templates/img"
+
+# Modules that are imported lazily by the request handlers. They are warmed in
+# a background thread once the app is ready so the first generation does not pay for them.
+HEAVY_MODULES = ["openai", "google.genai", "trafilatura", "lxml.html", "curl_cffi.requests", "requests"]
+
+def _template_seed_files():
+    """
+    Returns the sorted list of template files (HTML and preview images) used for seeding.
+    """
+    files = []
+    for directory in (TEMPLATES_CODE_DIR, TEMPLATES_IMG_DIR):
+        if os.path.isdir(directory):
+            files.extend(os.path.join(directory, f) for f in sorted(os.listdir(directory)))
+    return files
+
+def file_digest(paths):
+    """
+    Content hash of the given files (names and bytes).
+    """
+    h = hashlib.sha256()
+    for path in paths:
+        h.update(path.encode("utf-8"))
+        with open(path, "rb") as f:
+            h.update(f.read())
+    return h.hexdigest()
+
+def _digest_changed(session, key, digest):
+    state = session.get(SeedState, key)
+    return state is None or state.digest != digest
+
+def _record_digest(session, key, digest):
+    state = session.get(SeedState, key) or SeedState(key=key, digest=digest)
+    state.digest = digest
+    session.add(state)
+
+def _seed_prompts(session):
+    with open(PROMPTS_FILE, "r", encoding="utf-8") as f:
+        data = json.load(f)
+    existing = {p.key for p in session.exec(select(Prompt)).all()}
+    # Never overwrite prompts edited from the settings panel
+    for key, field in (("claude", "system_prompt_claude"), ("gemini", "system_prompt_gemini")):
+        if key not in existing:
+            session.add(Prompt(key=key, content=data.get(field, "")))
+
+def _seed_templates(session):
+    # Each seeded template gets a "template:<name>" row, so templates the
+    # user deleted are not added back when the seed files change.
+    seeded = {
+        s.key[len("template:"):]
+        for s in session.exec(select(SeedState).where(SeedState.key.startswith("template:"))).all()
+    }
+    # Databases seeded before these rows existed: the baseline seeded every
+    # template file into an empty table, so only record them.
+    legacy = not seeded and session.exec(select(Template)).first() is not None
+    if legacy:
+        logger.info("Templates already present, recording them as seeded.")
+    existing = set(session.exec(select(Template.name)).all())
+
+    for f in sorted(os.listdir(TEMPLATES_CODE_DIR)):
+        if not f.endswith(".html"):
+            continue
+        name = f.replace(".html", "").replace("_", " ").title()
+        if name in seeded:
+            continue
+        html_path = os.path.join(TEMPLATES_CODE_DIR, f)
+        if not legacy and name not in existing:
+            with open(html_path, "r", encoding="utf-8") as hf:
+                html_content = hf.read()
+
+            img_path = os.path.join(TEMPLATES_IMG_DIR, f.replace(".html", ".png"))
+            img_data = b""
+            if os.path.exists(img_path):
+                with open(img_path, "rb") as imgf:
+                    img_data = imgf.read()
+
+            session.add(Template(name=name, html_content=html_content, image_data=img_data))
+        session.add(SeedState(key=f"template:{name}", digest=file_digest([html_path])))
+
+def seed_database():
+    """
+    Seeds prompts and templates from disk. Prompts and templates are each only
+    seeded when their own files changed since the last run, and only missing rows
+    are inserted, so it is safe on every boot. Returns True if anything was seeded.
+    """
+    with Session(engine) as session:
+        seeded = False
+        try:
+            if os.path.exists(PROMPTS_FILE):
+                digest = file_digest([PROMPTS_FILE])
+                if _digest_changed(session, "seed_prompts", digest):
+                    logger.info("Seeding prompts from file...")
+                    _seed_prompts(session)
+                    _record_digest(session, "seed_prompts", digest)
+                    seeded = True
+
+            if os.path.isdir(TEMPLATES_CODE_DIR):
+                digest = file_digest(_template_seed_files())
+                if _digest_changed(session, "seed_templates", digest):
+                    logger.info("Seeding templates from files...")
+                    _seed_templates(session)
+                    _record_digest(session, "seed_templates", digest)
+                    seeded = True
+            session.commit()
+        except Exception as e:
+            logger.error(f"Error seeding data: {e}")
+            session.rollback()
+            return False
+
+        if not seeded:
+            logger.info("Seed files unchanged, skipping seeding.")
+        return seeded
+
+def _expected_chromium_dirs():
+    """
+    Browser directories (e.g. "chromium-1148") the installed Playwright version expects,
+    read from the driver's browsers.json. Empty if it cannot be determined.
+    """
+    try:
+        import playwright
+    except ImportError:
+        return []
+    browsers_json = os.path.join(os.path.dirname(playwright.__file__), "driver", "package", "browsers.json")
+    try:
+        with open(browsers_json, "r", encoding="utf-8") as f:
+            browsers = json.load(f).get("browsers", [])
+    except (OSError, ValueError):
+        return []
+    # Newer versions launch headless mode from a separate headless shell build
+    return [
+        f"{b['name'].replace('-', '_')}-{b['revision']}"
+        for b in browsers
+        if b.get("name") in ("chromium", "chromium-headless-shell") and b.get("revision")
+    ]
+
+def chromium_installed():
+    """
+    Checks the Playwright browser cache for the Chromium revision the installed
+    Playwright expects, without starting the driver.
+    """
+    expected = _expected_chromium_dirs()
+    if not expected:
+        return False
+    browsers_path = os.environ.get("PLAYWRIGHT_BROWSERS_PATH")
+    if browsers_path == "0":
+        # Browsers installed inside the playwright package
+        import playwright
+        browsers_path = os.path.join(os.path.dirname(playwright.__file__), "driver", "package", ".local-browsers")
+    elif not browsers_path:
+        if sys.platform == "darwin":
+            browsers_path = os.path.expanduser("~/Library/Caches/ms-playwright")
+        elif sys.platform.startswith("win"):
+            browsers_path = os.path.join(os.environ.get("LOCALAPPDATA", ""), "ms-playwright")
+        else:
+            browsers_path = os.path.join(os.environ.get("XDG_CACHE_HOME", os.path.expanduser("~/.cache")), "ms-playwright")
+    return all(os.path.isdir(os.path.join(browsers_path, d)) for d in expected)
+
+def ensure_chromium():
+    """
+    Installs Chromium for Playwright unless it is already present.
+    """
+    if chromium_installed():
+        logger.info("Chromium already installed, skipping playwright install.")
+        return
+    logger.info("Installing Chromium for Playwright...")
+    result = subprocess.run([sys.executable, "-m", "playwright", "install", "chromium"])
+    if result.returncode != 0:
+        # Level 3 scraping will fail, but levels 1 and 2 still work
+        logger.error(f"playwright install chromium failed with code {result.returncode}")
+
+def warm_imports():
+    """
+    Imports the heavy modules in a daemon thread.
+    """
+    def _run():
+        import importlib
+        for name in HEAVY_MODULES:
+            try:
+                importlib.import_module(name)
+            except Exception as e:
+                logger.warning(f"Could not preload {name}: {e}")
+
+    thread = threading.Thread(target=_run, name="warm-imports", daemon=True)
+    thread.start()
+    return thread
+
+if __name__ == "__main__":
+    # Used from the Procfile before starting uvicorn
+    ensure_chromium()
@@ -0,0 +1,265 @@
+import os
+import sys
+import json
+import time
+import uuid
+import asyncio
+import threading
+import contextvars
+from collections import Counter, deque
+from contextlib import contextmanager
+from app.utils import logger, log_dir
+from app.auth import decode_token, is_admin
+
+# Opt-in per-request tracing.
+# A Trace collects timed spans (scrape levels, extraction, prompt loading, LLM
+# calls, DB writes) for one request. Spans recorded outside a traced request are no-ops.
+# asyncio tasks and asyncio.to_thread copy the context, so spans inside the
+# scraper's worker threads land in the same trace.
+
+TRACING_ENABLED = os.environ.get("TRACING_ENABLED", "false").lower() in ("1", "true", "yes")
+SLOW_REQUEST_SECONDS = float(os.environ.get("SLOW_REQUEST_SECONDS", "30"))
+TRACE_BUFFER_SIZE = int(os.environ.get("TRACE_BUFFER_SIZE", "200"))
+PROFILE_INTERVAL_SECONDS = float(os.environ.get("PROFILE_INTERVAL_SECONDS", "0.005"))
+PROFILE_HEADER = "X-Profile" # Only honoured with an admin bearer token
+PROFILE_NEXT_MAX = int(os.environ.get("PROFILE_NEXT_MAX", "20")) # Max generations armed for profiling at once
+PROFILE_MAX_FILES = int(os.environ.get("PROFILE_MAX_FILES", "50")) # Oldest profiles are deleted beyond this
+
+profiles_dir = os.path.join(log_dir, "profiles")
+slow_log_file = os.path.join(log_dir, "slow_requests.log")
+
+_current_trace = contextvars.ContextVar("current_trace", default=None)
+
+# Recent generation traces (bounded), served by the admin endpoint
+recent_traces = deque(maxlen=TRACE_BUFFER_SIZE)
+
+# Number of upcoming requests to profile, set from the admin endpoint
+_profile_next = {"count": 0}
+_profile_lock = threading.Lock()
+
+_slow_logger = None
+
+def _get_slow_logger():
+    global _slow_logger
+    if _slow_logger is None:
+        import logging
+        _slow_logger = logging.getLogger("FAQGenerator.slow")
+        handler = logging.FileHandler(slow_log_file, encoding="utf-8")
+        handler.setFormatter(logging.Formatter("%(asctime)s %(message)s"))
+        _slow_logger.addHandler(handler)
+        # Full traces only go to slow_requests.log
+        _slow_logger.propagate = False
+    return _slow_logger
+
+class Trace:
+    def __init__(self, method, path):
+        self.id = uuid.uuid4().hex[:12]
+        self.method = method
+        self.path = path
+        self.user = None
+        self.status_code = None
+        self.started_at = time.time()
+        self._start = time.perf_counter()
+        self.duration = None
+        self.spans = []
+        self.profile_path = None
+
+    def add_span(self, name, start, duration, error=None):
+        # list.append is atomic, spans may come from worker threads
+        self.spans.append({
+            "name": name,
+            "start_ms": round((start - self._start) * 1000, 1),
+            "duration_ms": round(duration * 1000, 1),
+            "error": error,
+        })
+
+    def finish(self, status_code):
+        self.status_code = status_code
+        self.duration = time.perf_counter() - self._start
+
+    def to_dict(self):
+        return {
+            "id": self.id,
+            "method": self.method,
+            "path": self.path,
+            "user": self.user,
+            "status_code": self.status_code,
+            "started_at": self.started_at,
+            "duration_ms": round(self.duration * 1000, 1) if self.duration is not None else None,
+            "spans": sorted(self.spans, key=lambda s: s["start_ms"]),
+            "profile_path": self.profile_path,
+        }
+
+@contextmanager
+def span(name):
+    """
+    Times a block and records it on the current request's trace, if any.
+    """
+    trace = _current_trace.get()
+    if trace is None:
+        yield
+        return
+    start = time.perf_counter()
+    error = None
+    try:
+        yield
+    except BaseException as e:
+        error = type(e).__name__
+        raise
+    finally:
+        trace.add_span(name, start, time.perf_counter() - start, error)
+
+def current_trace():
+    return _current_trace.get()
+
+def detach_trace():
+    """
+    Stops recording spans in the current context, for background tasks that outlive their request.
+    """
+    _current_trace.set(None)
+
+def request_profile_next(count=1):
+    """
+    Arms profiling for the next `count` generations (capped at PROFILE_NEXT_MAX pending).
+    Returns the number pending.
+    """
+    if count < 1:
+        raise ValueError("count must be at least 1")
+    with _profile_lock:
+        _profile_next["count"] = min(_profile_next["count"] + count, PROFILE_NEXT_MAX)
+        return _profile_next["count"]
+
+def _take_profile_flag():
+    with _profile_lock:
+        if _profile_next["count"] > 0:
+            _profile_next["count"] -= 1
+            return True
+    return False
+
+class SamplingProfiler:
+    """
+    Samples the stacks of all threads at a fixed interval and writes them in
+    the folded format ("frame;frame;frame count") read by flamegraph.pl and speedscope.
+    Runs in the request's process, so concurrent requests show up in the samples too.
+    """
+    def __init__(self, interval=PROFILE_INTERVAL_SECONDS):
+        self.interval = interval
+        self.counts = Counter()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="sampling-profiler", daemon=True)
+
+    def _run(self):
+        own_id = threading.get_ident()
+        names = {}
+        while not self._stop.wait(self.interval):
+            for t in threading.enumerate():
+                names[t.ident] = t.name
+            for thread_id, frame in sys._current_frames().items():
+                if thread_id == own_id:
+                    continue
+                stack = []
+                while frame is not None:
+                    code = frame.f_code
+                    stack.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})")
+                    frame = frame.f_back
+                stack.append(names.get(thread_id, str(thread_id)))
+                self.counts[";".join(reversed(stack))] += 1
+
+    def start(self):
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+
+    def dump(self, path):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, "w", encoding="utf-8") as f:
+            for stack, count in self.counts.most_common():
+                f.write(f"{stack} {count}\n")
+
+def _prune_profiles():
+    try:
+        files = [os.path.join(profiles_dir, f) for f in os.listdir(profiles_dir) if f.endswith(".folded")]
+    except OSError:
+        return
+    files.sort(key=os.path.getmtime)
+    for path in files[:max(0, len(files) - PROFILE_MAX_FILES)]:
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+
+def _token_user(request):
+    # Checked here because the middleware runs before the auth dependencies
+    scheme, _, token = request.headers.get("Authorization", "").partition(" ")
+    if scheme.lower() != "bearer" or not token:
+        return None
+    payload = decode_token(token)
+    return payload.get("sub") if payload else None
+
+def should_trace(request):
+    """
+    Returns (trace, profile) flags for an incoming request.
+    """
+    if not request.url.path.startswith("/api/"):
+        return False, False
+    wants_profile = request.headers.get(PROFILE_HEADER, "").lower() in ("1", "true", "yes")
+    armed = request.url.path == "/api/generate"
+    profile = False
+    if wants_profile or armed:
+        user = _token_user(request)
+        if wants_profile and is_admin(user):
+            profile = True
+        elif armed and user:
+            # Unauthenticated calls must not consume the admin-armed profiles
+            profile = _take_profile_flag()
+    return TRACING_ENABLED or profile, profile
+
+async def trace_request(request, call_next):
+    """
+    HTTP middleware: traces opted-in requests, logs slow ones and keeps
+    generation traces in the ring buffer.
+    """
+    traced, profile = should_trace(request)
+    if not traced:
+        return await call_next(request)
+
+    trace = Trace(request.method, request.url.path)
+    token = _current_trace.set(trace)
+    profiler = SamplingProfiler() if profile else None
+    if profiler:
+        profiler.start()
+    status_code = 500
+    try:
+        response = await call_next(request)
+        status_code = response.status_code
+        return response
+    finally:
+        _current_trace.reset(token)
+        trace.finish(status_code)
+        if profiler:
+            trace.profile_path = os.path.join(profiles_dir, f"{trace.id}.folded")
+        if trace.path == "/api/generate":
+            recent_traces.append(trace)
+        slow = trace.duration >= SLOW_REQUEST_SECONDS
+        if profiler or slow:
+            # Thread join and file writes, kept off the event loop
+            await asyncio.to_thread(_write_trace_files, trace, profiler, slow)
+
+def _write_trace_files(trace, profiler, slow):
+    if profiler:
+        profiler.stop()
+        profiler.dump(trace.profile_path)
+        _prune_profiles()
+        logger.info(f"Profile written to {trace.profile_path}")
+    if slow:
+        logger.warning(f"Slow request {trace.method} {trace.path}: {trace.duration:.1f}s (trace {trace.id})")
+        _get_slow_logger().warning(json.dumps(trace.to_dict(), ensure_ascii=False))
+
+def slowest_traces(limit=20):
+    """
+    Slowest generations currently in the ring buffer, with their spans.
+    """
+    traces = sorted(recent_traces, key=lambda t: t.duration or 0, reverse=True)
+    return [t.to_dict() for t in traces[:limit]]
@@ -24,6 +24,12 @@ def log_interaction(step, input_data, output_data, error=None):
     """
     Logs interactions for debugging.
     """
+    # Imported here, app.tracing depends on this module
+    from app.tracing import span
+    with span("log_interaction"):
+        _log_interaction(step, input_data, output_data, error)
+
+def _log_interaction(step, input_data, output_data, error=None):
     log_entry = f"\n{'='*50}\nSTEP: {step}\nTIME: {datetime.now()}\n"
     log_entry += f"INPUT:\n{input_data}\n"
     if output_data:
@@ -0,0 +1,121 @@
+"""
+History read/write concurrency benchmark.
+
+Runs a mix of history list reads and history inserts (with a large result_html
+blob, like save_history) from many concurrent tasks, once through the async
+engine and once through the sync Session called from the event loop (the old
+request-handler path), and reports throughput and latency percentiles.
+
+Per-op latency alone favours the sync path: a blocking op is timed while it
+holds the event loop, so nothing else waits "inside" it. What the async path
+removes is the stall every other request sees, so a heartbeat task also measures
+event-loop lag (how late a 5 ms sleep wakes up) while the workload runs. That
+lag is added to every concurrent request, including ones that never touch the DB.
+
+Uses DATABASE_URL like the app; defaults to a throwaway SQLite file.
+Run from the repository root:
+    python benchmarks/bench_db_concurrency.py --tasks 50 --ops 20 --write-ratio 0.3
+"""
+import os
+import sys
+import time
+import json
+import random
+import asyncio
+import argparse
+import tempfile
+import statistics
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+if "DATABASE_URL" not in os.environ:
+    os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(tempfile.mkdtemp(), 'bench.db')}"
+
+from app.database import (
+    create_db_and_tables, engine, async_engine, AsyncSession, Session, History, select
+)
+
+BLOB = "<div class='faq'>" + ("x" * 200_000) + "</div>"
+
+def _new_history(user):
+    ts = int(time.time() * 1000)
+    return History(
+        user_id=user,
+        date=time.strftime("%Y-%m-%d %H:%M"),
+        keyword=f"kw {ts}",
+        inputs_json=json.dumps({"keyword": f"kw {ts}", "brief": "brief"}),
+        result_html=BLOB,
+        created_at_ts=ts // 1000,
+    )
+
+async def _async_op(user, write):
+    async with AsyncSession(async_engine, expire_on_commit=False) as session:
+        if write:
+            session.add(_new_history(user))
+            await session.commit()
+        else:
+            (await session.exec(select(History).where(History.user_id == user).order_by(History.id.desc()).limit(50))).all()
+
+async def _sync_op(user, write):
+    # Deliberately blocking, as the handlers used to be
+    with Session(engine) as session:
+        if write:
+            session.add(_new_history(user))
+            session.commit()
+        else:
+            session.exec(select(History).where(History.user_id == user).order_by(History.id.desc()).limit(50)).all()
+
+async def _worker(op, user, ops, write_ratio, latencies):
+    for _ in range(ops):
+        start = time.perf_counter()
+        await op(user, random.random() < write_ratio)
+        latencies.append(time.perf_counter() - start)
+        # Separate requests interleave on the loop between ops
+        await asyncio.sleep(0)
+
+HEARTBEAT_INTERVAL = 0.005
+
+async def _heartbeat(stop, lags):
+    while not stop.is_set():
+        expected = time.perf_counter() + HEARTBEAT_INTERVAL
+        await asyncio.sleep(HEARTBEAT_INTERVAL)
+        lags.append(max(0.0, time.perf_counter() - expected))
+
+async def run(op, tasks, ops, write_ratio):
+    latencies, lags = [], []
+    stop = asyncio.Event()
+    heartbeat = asyncio.create_task(_heartbeat(stop, lags))
+    await asyncio.sleep(0)
+    start = time.perf_counter()
+    await asyncio.gather(*[
+        _worker(op, f"user{i % 5}", ops, write_ratio, latencies) for i in range(tasks)
+    ])
+    elapsed = time.perf_counter() - start
+    stop.set()
+    await heartbeat
+    return elapsed, latencies, lags
+
+def _pct(values, q):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(q * len(values)))] * 1000 if values else 0.0
+
+def _report(label, elapsed, latencies, lags):
+    print(f"{label:<6} {len(latencies) / elapsed:8.1f} ops/s   op p50 {_pct(latencies, 0.50):7.1f} ms   op p99 {_pct(latencies, 0.99):7.1f} ms   mean {statistics.mean(latencies) * 1000:7.1f} ms")
+    print(f"{'':<6} loop lag ({len(lags)} beats)   p50 {_pct(lags, 0.50):7.1f} ms   p99 {_pct(lags, 0.99):7.1f} ms   max {max(lags, default=0) * 1000:7.1f} ms")
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--tasks", type=int, default=50)
+    parser.add_argument("--ops", type=int, default=20)
+    parser.add_argument("--write-ratio", type=float, default=0.3)
+    args = parser.parse_args()
+
+    create_db_and_tables()
+    for label, op in (("async", _async_op), ("sync", _sync_op)):
+        elapsed, latencies, lags = await run(op, args.tasks, args.ops, args.write_ratio)
+        _report(label, elapsed, latencies, lags)
+
+    await async_engine.dispose()
+
+if __name__ == "__main__":
+    asyncio.run(main())
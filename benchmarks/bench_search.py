@@ -0,0 +1,99 @@
+"""
+History search benchmark.
+
+Seeds a throwaway database with --rows history entries (half of them for the
+searching user), backfills the search index the way startup does, then times
+/api/history/search queries: common and rare terms, multi-term, short prefixes
+and deep pages.
+
+Uses DATABASE_URL like the app; defaults to a throwaway SQLite file.
+Run from the repository root:
+    python benchmarks/bench_search.py --rows 100000
+"""
+import os
+import sys
+import time
+import json
+import random
+import asyncio
+import argparse
+import tempfile
+import statistics
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+if "DATABASE_URL" not in os.environ:
+    os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(tempfile.mkdtemp(), 'bench.db')}"
+
+from sqlalchemy import insert
+from app.database import create_db_and_tables, engine, async_engine, AsyncSession, Session, History
+from app.search import create_search_tables, backfill_search_index, search_history
+
+USER = "admin"
+COMMON = ["envio", "precio", "talla", "devolucion", "garantia", "pago", "tienda", "producto"]
+RARE = ["zapatillas", "impermeable", "bicicleta", "hipoteca", "vegano", "ortodoncia"]
+# Synthetic vocabulary so prefixes like "w1" expand to many terms
+VOCAB = [f"w{i}" for i in range(5000)] + COMMON
+
+QUERIES = [
+    ("common term", "envio", 0),
+    ("rare term", "bicicleta", 0),
+    ("two terms", "envio precio", 0),
+    ("term + prefix", "envio gar", 0),
+    ("short prefix", "w1", 0),
+    ("3-char prefix", "w12", 0),
+    ("deep page", "envio", 980),
+]
+
+def _row(i, rng):
+    user = USER if i % 2 else f"user{i % 50}"
+    keyword = " ".join(rng.choices(VOCAB, k=2) + [rng.choice(RARE)] * (i % 20 == 1))
+    faq = " ".join(rng.choices(VOCAB, k=300))
+    return {
+        "user_id": user,
+        "date": "1 de enero de 2026",
+        "keyword": keyword,
+        "inputs_json": json.dumps({"keyword": keyword, "brief": " ".join(rng.choices(VOCAB, k=30)), "url": f"https://site{i % 300}.com/p/{i}"}),
+        "result_html": f"<div class='faq'><h3>{keyword}</h3><p>{faq}</p></div>",
+        "created_at_ts": i,
+    }
+
+def seed(rows):
+    rng = random.Random(1)
+    with Session(engine) as session:
+        for start in range(0, rows, 5000):
+            session.execute(insert(History), [_row(i, rng) for i in range(start, min(start + 5000, rows))])
+        session.commit()
+
+async def run_queries(repeat):
+    async with AsyncSession(async_engine, expire_on_commit=False) as session:
+        for label, q, offset in QUERIES:
+            timings = []
+            for _ in range(repeat):
+                start = time.perf_counter()
+                total, capped, hits = await search_history(session, USER, q, 20, offset)
+                timings.append(time.perf_counter() - start)
+            print(f"{label:<14} {q!r:<14} offset {offset:<5} median {statistics.median(timings) * 1000:7.1f} ms   max {max(timings) * 1000:7.1f} ms   total {total}{'+' if capped else ''}   hits {len(hits)}")
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=100_000)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    create_db_and_tables()
+    create_search_tables()
+
+    start = time.perf_counter()
+    seed(args.rows)
+    print(f"seeded {args.rows} rows in {time.perf_counter() - start:.1f}s")
+
+    start = time.perf_counter()
+    backfill_search_index()
+    print(f"backfilled index in {time.perf_counter() - start:.1f}s")
+
+    await run_queries(args.repeat)
+    await async_engine.dispose()
+
+if __name__ == "__main__":
+    asyncio.run(main())
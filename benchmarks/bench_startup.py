@@ -0,0 +1,81 @@
+"""
+Cold start benchmark.
+
+Measures, over several fresh interpreters:
+  - import time of app.main
+  - time from spawning uvicorn until /healthz answers (time-to-first-request)
+  - time until /readyz answers (DB initialized and seeded)
+
+Run from the repository root:
+    python benchmarks/bench_startup.py --runs 5
+"""
+import os
+import sys
+import time
+import socket
+import argparse
+import statistics
+import subprocess
+import urllib.request
+import urllib.error
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+def measure_import():
+    code = "import time; t = time.perf_counter(); import app.main; print(time.perf_counter() - t)"
+    out = subprocess.run([sys.executable, "-c", code], cwd=ROOT, capture_output=True, text=True, check=True)
+    return float(out.stdout.strip().splitlines()[-1])
+
+def _free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+def _wait_for(url, timeout):
+    deadline = time.perf_counter() + timeout
+    while time.perf_counter() < deadline:
+        try:
+            with urllib.request.urlopen(url, timeout=1) as r:
+                if r.status == 200:
+                    return time.perf_counter()
+        except (urllib.error.URLError, ConnectionError, OSError):
+            pass
+        time.sleep(0.01)
+    raise TimeoutError(f"{url} not ready after {timeout}s")
+
+def measure_first_request(timeout=60):
+    port = _free_port()
+    start = time.perf_counter()
+    proc = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "app.main:app", "--host", "127.0.0.1", "--port", str(port), "--log-level", "warning"],
+        cwd=ROOT, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+    )
+    try:
+        healthy = _wait_for(f"http://127.0.0.1:{port}/healthz", timeout)
+        ready = _wait_for(f"http://127.0.0.1:{port}/readyz", timeout)
+        return healthy - start, ready - start
+    finally:
+        proc.terminate()
+        proc.wait()
+
+def _summary(label, values):
+    print(f"{label:<22} median {statistics.median(values) * 1000:8.1f} ms   min {min(values) * 1000:8.1f} ms   max {max(values) * 1000:8.1f} ms")
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runs", type=int, default=5)
+    args = parser.parse_args()
+
+    imports, healthz, readyz = [], [], []
+    for _ in range(args.runs):
+        imports.append(measure_import())
+        h, r = measure_first_request()
+        healthz.append(h)
+        readyz.append(r)
+
+    _summary("import app.main", imports)
+    _summary("first /healthz", healthz)
+    _summary("first /readyz", readyz)
+
+if __name__ == "__main__":
+    main()
@@ -225,6 +225,17 @@ document.addEventListener('DOMContentLoaded', () => {
     els.urlInput.addEventListener('input', checkDirtyState);
     els.textInput.addEventListener('input', checkDirtyState);
 
+    // Start scraping in the background while the brief is still being written
+    els.urlInput.addEventListener('blur', () => {
+        const url = els.urlInput.value.trim();
+        if (!url || getSourceType() !== 'url') return;
+        authorizedFetch('/api/prefetch', {
+            method: 'POST',
+            headers: { 'Content-Type': 'application/json' },
+            body: JSON.stringify({ url })
+        }).catch(e => console.error("Prefetch error", e));
+    });
+
     function getCurrentInputState() {
         return {
             keyword: els.keywordInput.value.trim(),